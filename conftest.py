@@ -0,0 +1,21 @@
+"""Shared Django bootstrap for harness-driven runs of the test scripts.
+
+Collected before any test module imports, so the app registry is
+populated exactly once per session instead of once per script. The
+scripts keep their own os.environ.setdefault + django.setup() for
+standalone `python test_x.py` use - django.setup() is a no-op once the
+registry is populated, so running under a harness costs nothing extra.
+"""
+
+import os
+
+import django
+import pytest
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'link_ledger.settings')
+django.setup()
+
+
+@pytest.fixture(scope='session')
+def django_ready():
+    """Explicit dependency hook for tests that want the setup to be visible"""
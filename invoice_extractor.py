@@ -1,232 +1,504 @@
-import json
-import re
-from datetime import datetime
-from decimal import Decimal
-from file_handler.models import (
-    Company, CompanyAddress, Invoice, InvoiceItem,
-    Document, Country, Currency, ExtractedText, ExtractedMetadata
-)
-
-class InvoiceExtractor:
-    def __init__(self, ocr_data):
-        self.ocr_data = ocr_data
-        self.text_blocks = self._extract_text_blocks()
-        self.full_text = ' '.join([t['text'] for t in self.text_blocks])
-        
-    def _extract_text_blocks(self):
-        """Extract all text blocks with their positions"""
-        texts = []
-        for page in self.ocr_data.get('pages', []):
-            for block in page.get('blocks', []):
-                for line in block.get('lines', []):
-                    line_text = ' '.join([word['value'] for word in line.get('words', [])])
-                    texts.append({
-                        'text': line_text,
-                        'geometry': line.get('geometry'),
-                        'words': line.get('words', []),
-                        'confidence': line.get('objectness_score', 0)
-                    })
-        return texts
-    
-    def find_pattern(self, patterns, text=None):
-        """Search for patterns in text"""
-        search_text = text or self.full_text
-        for pattern in patterns:
-            match = re.search(pattern, search_text, re.IGNORECASE)
-            if match:
-                return match.group(1) if match.groups() else match.group(0)
-        return None
-    
-    def find_invoice_number(self):
-        """Extract invoice number"""
-        patterns = [
-            r'AEU-INV-[A-Z]{2}-\d{4}-\d+',  # Amazon pattern
-            r'Rechnungsnummer[\s:]*([A-Z0-9\-\/]+)',
-            r'Invoice[\s:]*(?:Number|Nr)?[\s:]*([A-Z0-9\-\/]+)',
-            r'Factur[aă][\s:]*(?:Nr)?[\s:]*([A-Z0-9\-\/]+)',
-        ]
-        return self.find_pattern(patterns)
-    
-    def find_date(self, date_type='invoice'):
-        """Extract dates from invoice"""
-        if date_type == 'invoice':
-            patterns = [
-                r'Rechnungsdatum[\s\S]*?(\d{1,2}[\s\.](?:November|November|Januar|Februar|März|April|Mai|Juni|Juli|August|September|Oktober|Dezember)[\s\.]\d{4})',
-                r'Invoice\s*Date[\s:]*(\d{1,2}[\/\-\.]\d{1,2}[\/\-\.]\d{4})',
-                r'Data\s*facturii[\s:]*(\d{1,2}[\/\-\.]\d{1,2}[\/\-\.]\d{4})',
-            ]
-        date_str = self.find_pattern(patterns)
-        if date_str:
-            # Parse the date - you'll need to handle different formats
-            return self.parse_date(date_str)
-        return None
-    
-    def parse_date(self, date_str):
-        """Parse various date formats"""
-        # German month names
-        month_map = {
-            'Januar': '01', 'Februar': '02', 'März': '03', 'April': '04',
-            'Mai': '05', 'Juni': '06', 'Juli': '07', 'August': '08',
-            'September': '09', 'Oktober': '10', 'November': '11', 'Dezember': '12'
-        }
-        
-        # Replace German months
-        for de_month, number in month_map.items():
-            if de_month in date_str:
-                day = re.search(r'(\d{1,2})', date_str).group(1)
-                year = re.search(r'(\d{4})', date_str).group(1)
-                return datetime.strptime(f"{day}/{number}/{year}", "%d/%m/%Y").date()
-        
-        # Try common formats
-        for fmt in ['%d/%m/%Y', '%d-%m-%Y', '%d.%m.%Y', '%Y-%m-%d']:
-            try:
-                return datetime.strptime(date_str, fmt).date()
-            except:
-                continue
-        return None
-    
-    def find_amounts(self):
-        """Extract monetary amounts"""
-        amounts = {}
-        
-        # Look for total amount - this is working well
-        total_patterns = [
-            r'Zahlbetrag[\s:]*([0-9.,]+)',
-            r'Total[\s:]*€?[\s]*([0-9.,]+)',
-            r'Gesamt[\s:]*€?[\s]*([0-9.,]+)',
-        ]
-        
-        total_str = self.find_pattern(total_patterns)
-        if total_str:
-            amounts['total'] = self.parse_amount(total_str)
-        
-        # Better patterns for tax and subtotal
-        for block in self.text_blocks:
-            text = block['text']
-            
-            # Look for subtotal lines
-            if 'Zwischensumme' in text and 'USt' not in text:
-                # Find the amount in the same line
-                if '107,16' in text or '99,14' in text:
-                    amount = self.parse_amount(text)
-                    if amount and 'subtotal' not in amounts:
-                        amounts['subtotal'] = amount
-            
-            # Look for tax lines - be more specific
-            if 'USt. Gesamt' in text or ('USt' in text and '0,00' in text):
-                # This invoice has 0% tax
-                if '0,00' in text:
-                    amounts['tax'] = Decimal('0.00')
-                else:
-                    amount = self.parse_amount(text)
-                    if amount and amount < amounts.get('total', Decimal('1000')):
-                        amounts['tax'] = amount
-                        
-        return amounts
-    
-    def parse_amount(self, text):
-        """Parse monetary amounts from text"""
-        # Find number patterns
-        pattern = r'([0-9]{1,3}(?:[.,][0-9]{3})*(?:[.,][0-9]{2})?)'
-        match = re.search(pattern, text)
-        if match:
-            amount_str = match.group(1)
-            # Convert European format to standard decimal
-            amount_str = amount_str.replace('.', '').replace(',', '.')
-            try:
-                return Decimal(amount_str)
-            except:
-                pass
-        return None
-    
-    def find_company_info(self, company_type='supplier'):
-        """Extract company information"""
-        info = {}
-        
-        if company_type == 'supplier' and 'Amazon' in self.full_text:
-            info['name'] = 'Amazon EU S.à r.l.'
-            # Look for VAT number
-            vat_patterns = [
-                r'IT08973230967',
-                r'USt-IDNr\.[\s:]*([A-Z]{2}[0-9]+)',
-            ]
-            info['vat_number'] = self.find_pattern(vat_patterns)
-            
-        elif company_type == 'customer' and 'SENSIDEV' in self.full_text:
-            info['name'] = 'SC SENSIDEV SRL'
-            info['vat_number'] = 'RO30428638'
-            
-        return info
-    
-    def process_invoice(self, document):
-        """Main method to process invoice and create database records"""
-        
-        # Extract invoice data
-        invoice_number = self.find_invoice_number()
-        if not invoice_number:
-            raise ValueError("Could not find invoice number")
-        
-        # Get or create companies
-        supplier_info = self.find_company_info('supplier')
-        supplier, _ = Company.objects.get_or_create(
-            vat_number=supplier_info.get('vat_number', 'UNKNOWN'),
-            defaults={'name': supplier_info.get('name', 'Unknown Supplier'), 'is_supplier': True}
-        )
-        
-        customer_info = self.find_company_info('customer')
-        customer, _ = Company.objects.get_or_create(
-            vat_number=customer_info.get('vat_number', 'UNKNOWN'),
-            defaults={'name': customer_info.get('name', 'Unknown Customer'), 'is_customer': True}
-        )
-        
-        # Check if invoice already exists
-        existing_invoice = Invoice.objects.filter(
-            supplier=supplier,
-            invoice_number=invoice_number
-        ).first()
-        
-        if existing_invoice:
-            print(f"Invoice {invoice_number} already exists, updating document link...")
-            # Update the existing invoice's document
-            existing_invoice.document = document
-            existing_invoice.save()
-            return existing_invoice
-        
-        # Get amounts
-        amounts = self.find_amounts()
-        
-        # Get or create currency
-        currency, _ = Currency.objects.get_or_create(
-            code='EUR',
-            defaults={'name': 'Euro', 'symbol': '€'}
-        )
-        
-        # Create new invoice
-        invoice = Invoice.objects.create(
-            document=document,
-            invoice_number=invoice_number,
-            invoice_date=self.find_date('invoice') or datetime.now().date(),
-            supplier=supplier,
-            customer=customer,
-            currency=currency,
-            subtotal=amounts.get('subtotal', Decimal('0')),
-            tax_amount=amounts.get('tax', Decimal('0')),
-            total_amount=amounts.get('total', Decimal('0'))
-        )
-        
-        # Store extracted metadata
-        for field_name, field_value in [
-            ('invoice_number', invoice_number),
-            ('supplier_name', supplier_info.get('name')),
-            ('customer_name', customer_info.get('name')),
-            ('total_amount', str(amounts.get('total'))),
-        ]:
-            if field_value:
-                ExtractedMetadata.objects.create(
-                    document=document,
-                    field_name=field_name,
-                    field_value=field_value,
-                    extraction_method='pattern_matching'
-                )
-        
+import hashlib
+import io
+import json
+import os
+import re
+from datetime import datetime
+from functools import cached_property
+
+import numpy as np
+import orjson
+from decimal import Decimal
+from file_handler.models import (
+    Company, CompanyAddress, Invoice, InvoiceItem,
+    Document, Country, Currency, ExtractedText, ExtractedMetadata
+)
+
+# Compile patterns once at import time - batch processing calls the
+# extraction methods thousands of times, so recompiling per call is
+# measurable overhead.
+_INVOICE_NUM_PATTERNS = [re.compile(p, re.IGNORECASE) for p in (
+    r'AEU-INV-[A-Z]{2}-\d{4}-\d+',  # Amazon pattern
+    r'Rechnungsnummer[\s:]*([A-Z0-9\-\/]+)',
+    r'Invoice[\s:]*(?:Number|Nr)?[\s:]*([A-Z0-9\-\/]+)',
+    r'Factur[aă][\s:]*(?:Nr)?[\s:]*([A-Z0-9\-\/]+)',
+)]
+
+_INVOICE_DATE_PATTERNS = [re.compile(p, re.IGNORECASE) for p in (
+    r'Rechnungsdatum[\s\S]*?(\d{1,2}[\s\.](?:November|November|Januar|Februar|März|April|Mai|Juni|Juli|August|September|Oktober|Dezember)[\s\.]\d{4})',
+    r'Invoice\s*Date[\s:]*(\d{1,2}[\/\-\.]\d{1,2}[\/\-\.]\d{4})',
+    r'Data\s*facturii[\s:]*(\d{1,2}[\/\-\.]\d{1,2}[\/\-\.]\d{4})',
+)]
+
+_TOTAL_PATTERNS = [re.compile(p, re.IGNORECASE) for p in (
+    r'Zahlbetrag[\s:]*([0-9.,]+)',
+    r'Total[\s:]*€?[\s]*([0-9.,]+)',
+    r'Gesamt[\s:]*€?[\s]*([0-9.,]+)',
+)]
+
+_SUPPLIER_VAT_PATTERNS = [re.compile(p, re.IGNORECASE) for p in (
+    r'IT08973230967',
+    r'USt-IDNr\.[\s:]*([A-Z]{2}[0-9]+)',
+)]
+
+_AMOUNT_RE = re.compile(r'([0-9]{1,3}(?:[.,][0-9]{3})*(?:[.,][0-9]{2})?)')
+_DAY_RE = re.compile(r'(\d{1,2})')
+_YEAR_RE = re.compile(r'(\d{4})')
+
+
+def _scan_amount(text):
+    """
+    Single-pass scanner equivalent to matching _AMOUNT_RE and applying the
+    European-format conversion (drop '.', treat ',' as decimal point).
+
+    parse_amount is called for every candidate line in every batch file, so
+    this avoids regex backtracking plus the replace/replace/Decimal-from-str
+    round trip of the old implementation. Returns None when no amount is
+    found or the matched text has more than one comma (which the old code
+    rejected via a Decimal parse error).
+    """
+    n = len(text)
+    i = 0
+    while i < n:
+        if text[i].isdigit():
+            # Leading group: 1-3 digits
+            start = i
+            while i < n and i - start < 3 and text[i].isdigit():
+                i += 1
+            # The old conversion dropped every '.' and turned the (single)
+            # comma into the decimal point, so digits before the comma are
+            # integral and everything after it is fractional.
+            integral = text[start:i]
+            fractional = ''
+            seen_comma = False
+            # Thousands groups: separator + 3 digits
+            while i < n and text[i] in '.,':
+                group = text[i + 1:i + 4]
+                if len(group) != 3 or not group.isdigit():
+                    break
+                if text[i] == ',':
+                    if seen_comma:
+                        return None  # two commas -> old code raised in Decimal
+                    seen_comma = True
+                if seen_comma:
+                    fractional += group
+                else:
+                    integral += group
+                i += 4
+            # Optional decimal part: separator + 2 digits
+            if i < n and text[i] in '.,':
+                frac = text[i + 1:i + 3]
+                if len(frac) == 2 and frac.isdigit():
+                    if text[i] == ',':
+                        if seen_comma:
+                            return None
+                        seen_comma = True
+                    if seen_comma:
+                        fractional += frac
+                    else:
+                        integral += frac
+            if seen_comma:
+                return Decimal(f'{integral}.{fractional}')
+            return Decimal(integral)
+        i += 1
+    return None
+
+
+def _scan_day_year(text):
+    """One pass over a date string returning (first 1-2 digit run, first 4 digit run)"""
+    day = None
+    year = None
+    i = 0
+    n = len(text)
+    while i < n and (day is None or year is None):
+        if text[i].isdigit():
+            start = i
+            while i < n and text[i].isdigit():
+                i += 1
+            run = text[start:i]
+            if day is None:
+                day = run[:2]
+            if year is None and len(run) >= 4:
+                year = run[:4]
+        else:
+            i += 1
+    return day, year
+
+# Single-pass field scanning: instead of scanning full_text once per pattern
+# (O(patterns x text) with backtracking), combine every field's patterns into
+# one alternation and walk the text once, recording the first hit per field.
+# google-re2 gives guaranteed-linear matching when installed; stdlib re is
+# the fallback. Set INVOICE_SINGLE_PASS=0 to force the sequential path.
+try:
+    import re2 as _scan_re
+except ImportError:
+    _scan_re = re
+
+_USE_SINGLE_PASS = os.getenv('INVOICE_SINGLE_PASS', '1') != '0'
+
+# Extraction-result cache keyed by OCR-content hash, so reruns over identical
+# OCR outputs (reprocessing, pattern development) skip the regex pipeline.
+# Bump the version whenever the extraction patterns change so stale entries
+# are invalidated automatically.
+_EXTRACT_CACHE_VERSION = 1
+_EXTRACT_CACHE = {}
+
+# Combined alternations for find_pattern, memoized per pattern list: one scan
+# of the text instead of one scan per pattern when the early patterns miss.
+_COMBINED_CACHE = {}
+
+
+def _combined_pattern(patterns):
+    """Build (and cache) a single alternation regex for a list of patterns"""
+    key = tuple(p.pattern for p in patterns)
+    combined = _COMBINED_CACHE.get(key)
+    if combined is None:
+        combined = re.compile(
+            '|'.join(f'(?P<g{i}>{p})' for i, p in enumerate(key)), re.IGNORECASE
+        )
+        _COMBINED_CACHE[key] = combined
+    return combined
+
+_FIELD_PATTERNS = {
+    'invoice_number': _INVOICE_NUM_PATTERNS,
+    'invoice_date': _INVOICE_DATE_PATTERNS,
+    'total': _TOTAL_PATTERNS,
+    'supplier_vat': _SUPPLIER_VAT_PATTERNS,
+}
+
+# Nested groups inside each alternative are fine: only the outer named group
+# for the matching alternative is set, so m.lastgroup identifies the field.
+_GROUP_TO_FIELD = {}
+_alternatives = []
+for _field, _patterns in _FIELD_PATTERNS.items():
+    for _i, _pat in enumerate(_patterns):
+        _group = f'{_field}_{_i}'
+        _GROUP_TO_FIELD[_group] = _field
+        _alternatives.append(f'(?P<{_group}>{_pat.pattern})')
+try:
+    _ALL_FIELDS_RE = _scan_re.compile('|'.join(_alternatives), re.IGNORECASE)
+except Exception:
+    # re2 rejects some constructs stdlib re accepts - fall back silently
+    _scan_re = re
+    _ALL_FIELDS_RE = re.compile('|'.join(_alternatives), re.IGNORECASE)
+del _alternatives, _field, _patterns, _i, _pat, _group
+
+
+class ExtractionContext:
+    """
+    Per-batch cache of Company/Currency rows for process_invoice.
+
+    get_or_create on the hot path costs a round-trip per call even though
+    it's almost always a hit; the context preloads both tables once and only
+    touches the database for genuinely new rows.
+    """
+
+    def __init__(self):
+        self.companies_by_vat = {c.vat_number: c for c in Company.objects.all()}
+        self.currencies_by_code = {c.code: c for c in Currency.objects.all()}
+
+    def get_company(self, vat_number, defaults):
+        company = self.companies_by_vat.get(vat_number)
+        if company is None:
+            company = Company(vat_number=vat_number, **defaults)
+            # Persist immediately - invoices reference the row by FK
+            Company.objects.bulk_create([company], ignore_conflicts=True)
+            self.companies_by_vat[vat_number] = company
+        return company
+
+    def get_currency(self, code, defaults):
+        currency = self.currencies_by_code.get(code)
+        if currency is None:
+            currency, _ = Currency.objects.get_or_create(code=code, defaults=defaults)
+            self.currencies_by_code[code] = currency
+        return currency
+
+
+class InvoiceExtractor:
+    def __init__(self, ocr_data, context=None):
+        self.ocr_data = ocr_data
+        self.context = context
+        self.full_text = self._build_full_text()
+        self._field_hits = None
+
+    def _build_full_text(self):
+        """Build the searchable text in one pass, without materializing block dicts"""
+        buf = io.StringIO()
+        for page in self.ocr_data.get('pages', []):
+            for block in page.get('blocks', []):
+                for line in block.get('lines', []):
+                    for word in line.get('words', []):
+                        buf.write(word['value'])
+                        buf.write(' ')
+        return buf.getvalue().rstrip()
+
+    @cached_property
+    def text_blocks(self):
+        """Text blocks with their positions, built lazily on first access"""
+        texts = []
+        for page in self.ocr_data.get('pages', []):
+            for block in page.get('blocks', []):
+                for line in block.get('lines', []):
+                    line_text = ' '.join([word['value'] for word in line.get('words', [])])
+                    texts.append({
+                        'text': line_text,
+                        'geometry': line.get('geometry'),
+                        'words': line.get('words', []),
+                        'confidence': line.get('objectness_score', 0)
+                    })
+        return texts
+    
+    @cached_property
+    def _texts_np(self):
+        """Line texts as a NumPy unicode array for vectorized substring tests"""
+        return np.array([t['text'] for t in self.text_blocks], dtype=str)
+
+    @cached_property
+    def content_key(self):
+        """Cache key derived from the OCR content and the pattern version"""
+        digest = hashlib.sha256(
+            orjson.dumps(self.ocr_data, option=orjson.OPT_SORT_KEYS)
+        ).hexdigest()
+        return f"v{_EXTRACT_CACHE_VERSION}-{digest}"
+
+    def extract_fields(self):
+        """
+        Run all pure extraction methods, cached by OCR-content hash.
+
+        Identical OCR payloads (reruns, reprocess-failed sweeps) hit the
+        cache and skip the regex pipeline entirely.
+        """
+        fields = _EXTRACT_CACHE.get(self.content_key)
+        if fields is None:
+            fields = {
+                'invoice_number': self.find_invoice_number(),
+                'invoice_date': self.find_date('invoice'),
+                'amounts': self.find_amounts(),
+                'supplier_info': self.find_company_info('supplier'),
+                'customer_info': self.find_company_info('customer'),
+            }
+            _EXTRACT_CACHE[self.content_key] = fields
+        return fields
+
+    def find_pattern(self, patterns, text=None):
+        """Search for pre-compiled patterns in text with one combined scan"""
+        search_text = text or self.full_text
+        match = _combined_pattern(patterns).search(search_text)
+        if not match:
+            return None
+        # Recover the capture group by re-matching only the winning pattern
+        # against the matched substring
+        winner = patterns[int(match.lastgroup[1:])]
+        inner = winner.search(match.group(0))
+        if inner is None:
+            return match.group(0)
+        return inner.group(1) if inner.groups() else inner.group(0)
+
+    def _scan_all_fields(self):
+        """One pass over full_text collecting the first hit per field"""
+        if self._field_hits is None:
+            hits = {}
+            for match in _ALL_FIELDS_RE.finditer(self.full_text):
+                field = _GROUP_TO_FIELD[match.lastgroup]
+                if field not in hits:
+                    hits[field] = match.group(0)
+                    if len(hits) == len(_FIELD_PATTERNS):
+                        break
+            self._field_hits = hits
+        return self._field_hits
+
+    def _extract_field(self, field):
+        """Pull a field value out of the single-pass scan results"""
+        hit = self._scan_all_fields().get(field)
+        if hit is None:
+            return None
+        # Re-run the per-field patterns only on the tiny matched substring
+        # to recover the capture group
+        return self.find_pattern(_FIELD_PATTERNS[field], text=hit)
+
+    def find_invoice_number(self):
+        """Extract invoice number"""
+        if _USE_SINGLE_PASS:
+            return self._extract_field('invoice_number')
+        return self.find_pattern(_INVOICE_NUM_PATTERNS)
+
+    def find_date(self, date_type='invoice'):
+        """Extract dates from invoice"""
+        if date_type == 'invoice':
+            patterns = _INVOICE_DATE_PATTERNS
+        if _USE_SINGLE_PASS:
+            date_str = self._extract_field('invoice_date')
+        else:
+            date_str = self.find_pattern(patterns)
+        if date_str:
+            # Parse the date - you'll need to handle different formats
+            return self.parse_date(date_str)
+        return None
+    
+    def parse_date(self, date_str):
+        """Parse various date formats"""
+        # German month names
+        month_map = {
+            'Januar': '01', 'Februar': '02', 'März': '03', 'April': '04',
+            'Mai': '05', 'Juni': '06', 'Juli': '07', 'August': '08',
+            'September': '09', 'Oktober': '10', 'November': '11', 'Dezember': '12'
+        }
+        
+        # Replace German months
+        for de_month, number in month_map.items():
+            if de_month in date_str:
+                day, year = _scan_day_year(date_str)
+                return datetime(int(year), int(number), int(day)).date()
+        
+        # Try common formats
+        for fmt in ['%d/%m/%Y', '%d-%m-%Y', '%d.%m.%Y', '%Y-%m-%d']:
+            try:
+                return datetime.strptime(date_str, fmt).date()
+            except:
+                continue
+        return None
+    
+    def find_amounts(self):
+        """Extract monetary amounts"""
+        amounts = {}
+        
+        # Look for total amount - this is working well
+        if _USE_SINGLE_PASS:
+            total_str = self._extract_field('total')
+        else:
+            total_str = self.find_pattern(_TOTAL_PATTERNS)
+        if total_str:
+            amounts['total'] = self.parse_amount(total_str)
+        
+        # Better patterns for tax and subtotal. The substring tests run
+        # vectorized over all lines at once; parse_amount only touches the
+        # handful of lines that survive the masks.
+        texts = self._texts_np
+        if texts.size:
+            has_zwischensumme = np.char.find(texts, 'Zwischensumme') >= 0
+            has_ust = np.char.find(texts, 'USt') >= 0
+            has_ust_gesamt = np.char.find(texts, 'USt. Gesamt') >= 0
+            has_zero = np.char.find(texts, '0,00') >= 0
+            has_known_subtotal = (
+                (np.char.find(texts, '107,16') >= 0) | (np.char.find(texts, '99,14') >= 0)
+            )
+
+            # Look for subtotal lines
+            subtotal_mask = has_zwischensumme & ~has_ust & has_known_subtotal
+            for idx in np.nonzero(subtotal_mask)[0]:
+                amount = self.parse_amount(str(texts[idx]))
+                if amount and 'subtotal' not in amounts:
+                    amounts['subtotal'] = amount
+
+            # Look for tax lines - be more specific
+            tax_mask = has_ust_gesamt | (has_ust & has_zero)
+            for idx in np.nonzero(tax_mask)[0]:
+                # This invoice has 0% tax
+                if has_zero[idx]:
+                    amounts['tax'] = Decimal('0.00')
+                else:
+                    amount = self.parse_amount(str(texts[idx]))
+                    if amount and amount < amounts.get('total', Decimal('1000')):
+                        amounts['tax'] = amount
+
+        return amounts
+    
+    def parse_amount(self, text):
+        """Parse monetary amounts from text"""
+        # Single-pass scanner equivalent to _AMOUNT_RE plus the European
+        # decimal conversion - see _scan_amount
+        try:
+            return _scan_amount(text)
+        except (ValueError, ArithmeticError):
+            return None
+    
+    def find_company_info(self, company_type='supplier'):
+        """Extract company information"""
+        info = {}
+        
+        if company_type == 'supplier' and 'Amazon' in self.full_text:
+            info['name'] = 'Amazon EU S.à r.l.'
+            # Look for VAT number
+            if _USE_SINGLE_PASS:
+                info['vat_number'] = self._extract_field('supplier_vat')
+            else:
+                info['vat_number'] = self.find_pattern(_SUPPLIER_VAT_PATTERNS)
+            
+        elif company_type == 'customer' and 'SENSIDEV' in self.full_text:
+            info['name'] = 'SC SENSIDEV SRL'
+            info['vat_number'] = 'RO30428638'
+            
+        return info
+    
+    def process_invoice(self, document):
+        """Main method to process invoice and create database records"""
+        
+        # Extract invoice data (cached by OCR-content hash)
+        fields = self.extract_fields()
+        invoice_number = fields['invoice_number']
+        if not invoice_number:
+            raise ValueError("Could not find invoice number")
+        
+        # Get or create companies through the (possibly shared) lookup cache
+        context = self.context or ExtractionContext()
+
+        supplier_info = fields['supplier_info']
+        supplier = context.get_company(
+            supplier_info.get('vat_number') or 'UNKNOWN',
+            {'name': supplier_info.get('name', 'Unknown Supplier'), 'is_supplier': True}
+        )
+
+        customer_info = fields['customer_info']
+        customer = context.get_company(
+            customer_info.get('vat_number') or 'UNKNOWN',
+            {'name': customer_info.get('name', 'Unknown Customer'), 'is_customer': True}
+        )
+        
+        # Check if invoice already exists
+        existing_invoice = Invoice.objects.filter(
+            supplier=supplier,
+            invoice_number=invoice_number
+        ).first()
+        
+        if existing_invoice:
+            print(f"Invoice {invoice_number} already exists, updating document link...")
+            # Update the existing invoice's document
+            existing_invoice.document = document
+            existing_invoice.save()
+            return existing_invoice
+        
+        # Get amounts
+        amounts = fields['amounts']
+        
+        # Get or create currency
+        currency = context.get_currency('EUR', {'name': 'Euro', 'symbol': '€'})
+        
+        # Create new invoice
+        invoice = Invoice.objects.create(
+            document=document,
+            invoice_number=invoice_number,
+            invoice_date=fields['invoice_date'] or datetime.now().date(),
+            supplier=supplier,
+            customer=customer,
+            currency=currency,
+            subtotal=amounts.get('subtotal', Decimal('0')),
+            tax_amount=amounts.get('tax', Decimal('0')),
+            total_amount=amounts.get('total', Decimal('0'))
+        )
+        
+        # Store extracted metadata
+        for field_name, field_value in [
+            ('invoice_number', invoice_number),
+            ('supplier_name', supplier_info.get('name')),
+            ('customer_name', customer_info.get('name')),
+            ('total_amount', str(amounts.get('total'))),
+        ]:
+            if field_value:
+                ExtractedMetadata.objects.create(
+                    document=document,
+                    field_name=field_name,
+                    field_value=field_value,
+                    extraction_method='pattern_matching'
+                )
+        
         return invoice
\ No newline at end of file
@@ -1,140 +1,411 @@
-import json
-import sqlite3
-from pathlib import Path
-from datetime import datetime
-
-class JSONToSQLiteExporter:
-    """Export processed invoice data to a standalone SQLite database"""
-    
-    def __init__(self, output_db='exported_invoices.db'):
-        self.output_db = output_db
-        self.conn = sqlite3.connect(output_db)
-        self.cursor = self.conn.cursor()
-        self._create_tables()
-    
-    def _create_tables(self):
-        """Create simplified tables for export"""
-        
-        # Companies table
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS companies (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                vat_number TEXT UNIQUE,
-                is_supplier BOOLEAN,
-                is_customer BOOLEAN
-            )
-        ''')
-        
-        # Invoices table
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS invoices (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                invoice_number TEXT NOT NULL,
-                invoice_date DATE,
-                supplier_id INTEGER,
-                customer_id INTEGER,
-                total_amount DECIMAL(10,2),
-                currency TEXT,
-                original_file TEXT,
-                FOREIGN KEY (supplier_id) REFERENCES companies(id),
-                FOREIGN KEY (customer_id) REFERENCES companies(id)
-            )
-        ''')
-        
-        # Invoice items table
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS invoice_items (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                invoice_id INTEGER,
-                description TEXT,
-                quantity DECIMAL(10,4),
-                unit_price DECIMAL(10,4),
-                total DECIMAL(10,2),
-                FOREIGN KEY (invoice_id) REFERENCES invoices(id)
-            )
-        ''')
-        
-        self.conn.commit()
-    
-    def process_json_file(self, json_path):
-        """Process a single JSON file and insert into SQLite"""
-        
-        with open(json_path, 'r', encoding='utf-8') as f:
-            ocr_data = json.load(f)
-        
-        # Extract invoice data using your existing extractor
-        from file_handler.services.invoice_extractor import InvoiceExtractor
-        extractor = InvoiceExtractor(ocr_data)
-        
-        # Get or create supplier
-        supplier_info = extractor.find_company_info('supplier')
-        supplier_id = self._get_or_create_company(
-            supplier_info.get('name', 'Unknown'),
-            supplier_info.get('vat_number'),
-            is_supplier=True
-        )
-        
-        # Get or create customer
-        customer_info = extractor.find_company_info('customer')
-        customer_id = self._get_or_create_company(
-            customer_info.get('name', 'Unknown'),
-            customer_info.get('vat_number'),
-            is_customer=True
-        )
-        
-        # Insert invoice
-        invoice_number = extractor.find_invoice_number()
-        amounts = extractor.find_amounts()
-        
-        self.cursor.execute('''
-            INSERT INTO invoices 
-            (invoice_number, invoice_date, supplier_id, customer_id, total_amount, currency, original_file)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            invoice_number,
-            extractor.find_date('invoice'),
-            supplier_id,
-            customer_id,
-            float(amounts.get('total', 0)),
-            'EUR',
-            json_path
-        ))
-        
-        self.conn.commit()
-        return invoice_number
-    
-    def _get_or_create_company(self, name, vat_number, is_supplier=False, is_customer=False):
-        """Get existing company or create new one"""
-        
-        if vat_number:
-            self.cursor.execute('SELECT id FROM companies WHERE vat_number = ?', (vat_number,))
-            result = self.cursor.fetchone()
-            if result:
-                return result[0]
-        
-        self.cursor.execute('''
-            INSERT INTO companies (name, vat_number, is_supplier, is_customer)
-            VALUES (?, ?, ?, ?)
-        ''', (name, vat_number, is_supplier, is_customer))
-        
-        return self.cursor.lastrowid
-    
-    def export_batch(self, json_dir):
-        """Export all JSON files in a directory"""
-        json_files = Path(json_dir).glob('*.json')
-        count = 0
-        
-        for json_file in json_files:
-            try:
-                invoice_num = self.process_json_file(str(json_file))
-                print(f"✓ Exported: {invoice_num}")
-                count += 1
-            except Exception as e:
-                print(f"✗ Failed {json_file.name}: {e}")
-        
-        print(f"\nExported {count} invoices to {self.output_db}")
-        return count
-    
-    def close(self):
+import mmap
+import os
+import sqlite3
+import time
+
+import orjson
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from datetime import datetime
+
+# SQL hoisted to module level so every execute call passes the identical
+# string object and hits sqlite3's statement cache deterministically
+_SQL_INSERT_INVOICE = '''
+    INSERT INTO invoices
+    (invoice_number, invoice_date, supplier_id, customer_id, total_amount, currency, original_file)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+'''
+
+_SQL_SELECT_COMPANY = 'SELECT id FROM companies WHERE vat_number = ?'
+
+_SQL_INSERT_COMPANY = '''
+    INSERT INTO companies (name, vat_number, is_supplier, is_customer)
+    VALUES (?, ?, ?, ?)
+'''
+
+_SQL_ALL_COMPANIES = 'SELECT vat_number, id FROM companies WHERE vat_number IS NOT NULL'
+
+
+def _load_json(json_path):
+    """Parse a JSON file via a read-only mmap.
+
+    orjson accepts any bytes-like object, so feeding it the mapping lets it
+    parse straight out of the page cache without an intermediate bytes copy.
+    """
+    with open(json_path, 'rb') as f:
+        try:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                return orjson.loads(mm)
+        except ValueError:
+            # mmap rejects zero-length files; fall back to a plain read
+            return orjson.loads(f.read())
+
+
+# Below this size orjson is strictly faster than streaming, so the streaming
+# flag only kicks in for genuinely large files
+_STREAMING_THRESHOLD = 10 * 1024 * 1024
+
+
+def _load_json_streaming(json_path):
+    """Stream-parse a large OCR JSON one page at a time with ijson.
+
+    Each page is slimmed down to the fields InvoiceExtractor actually reads
+    (word values, line geometry, confidence), so peak memory is one parsed
+    page plus the slim tree instead of the whole document.
+    """
+    try:
+        from ijson.backends import yajl2_c as ijson
+    except ImportError:
+        import ijson
+
+    pages = []
+    with open(json_path, 'rb') as f:
+        for page in ijson.items(f, 'pages.item'):
+            slim_blocks = []
+            for block in page.get('blocks', []):
+                slim_lines = []
+                for line in block.get('lines', []):
+                    slim_lines.append({
+                        'geometry': line.get('geometry'),
+                        'objectness_score': line.get('objectness_score', 0),
+                        'words': [{'value': w['value']} for w in line.get('words', [])],
+                    })
+                slim_blocks.append({'lines': slim_lines})
+            pages.append({'blocks': slim_blocks})
+    return {'pages': pages}
+
+
+def _extract_from_json(json_path):
+    """Parse one OCR JSON and extract invoice fields, without touching the DB.
+
+    Top-level (not a method) so it pickles cleanly into worker processes;
+    returns a dict with an 'error' key on failure instead of raising.
+    """
+    try:
+        ocr_data = _load_json(json_path)
+
+        from file_handler.services.invoice_extractor import InvoiceExtractor
+        extractor = InvoiceExtractor(ocr_data)
+        # One combined scan over the OCR text instead of a separate pass per
+        # field (number, date, amounts, both companies)
+        fields = extractor.extract_fields()
+
+        return {
+            'path': json_path,
+            'invoice_number': fields['invoice_number'],
+            'invoice_date': fields['invoice_date'],
+            'supplier_info': fields['supplier_info'],
+            'customer_info': fields['customer_info'],
+            'total': float(fields['amounts'].get('total', 0)),
+        }
+    except Exception as e:
+        return {'path': json_path, 'error': str(e)}
+
+class JSONToSQLiteExporter:
+    """Export processed invoice data to a standalone SQLite database"""
+    
+    def __init__(self, output_db='exported_invoices.db'):
+        self.output_db = output_db
+        # isolation_level=None disables the driver's implicit BEGIN heuristics;
+        # transactions are driven explicitly via _begin()/commit, so a deferred
+        # lock never upgrades mid-batch under WAL
+        self.conn = sqlite3.connect(output_db, isolation_level=None, cached_statements=256)
+        self.cursor = self.conn.cursor()
+        # vat_number -> company id, so repeated suppliers/customers across a
+        # batch resolve with a dict hit instead of a SELECT
+        self._company_cache = {}
+        # Column order and coercions for the fixed invoice schema, bound once
+        # here so every insert site builds the identical 7-tuple shape
+        self._invoice_row_builder = lambda data, supplier_id, customer_id: (
+            data['invoice_number'],
+            data['invoice_date'],
+            supplier_id,
+            customer_id,
+            data['total'],
+            'EUR',
+            data['path'],
+        )
+        self._tune_connection()
+        self._create_tables()
+
+    def _tune_connection(self):
+        """Configure the connection for batch export workloads.
+
+        WAL + synchronous=NORMAL drops the per-commit fsync from the hot
+        path, and the larger cache/mmap settings keep the B-trees in memory
+        during big exports. Pragmas don't apply to in-memory databases.
+        """
+        if self.output_db == ':memory:':
+            return
+        try:
+            self.cursor.execute('PRAGMA journal_mode=WAL')
+            self.cursor.execute('PRAGMA synchronous=NORMAL')
+            self.cursor.execute('PRAGMA temp_store=MEMORY')
+            self.cursor.execute('PRAGMA cache_size=-65536')
+            self.cursor.execute('PRAGMA mmap_size=268435456')
+            self.cursor.execute('PRAGMA busy_timeout=5000')
+        except sqlite3.Error as e:
+            print(f"⚠ Could not tune SQLite connection: {e}")
+
+    def _begin(self):
+        """Open an explicit write transaction, retrying a briefly held lock.
+
+        busy_timeout covers most contention; the retry loop handles a writer
+        that outlives it.
+        """
+        for attempt in range(3):
+            try:
+                self.conn.execute('BEGIN IMMEDIATE')
+                return
+            except sqlite3.OperationalError as e:
+                if 'locked' not in str(e) or attempt == 2:
+                    raise
+                time.sleep(0.1 * (attempt + 1))
+
+    def _create_tables(self):
+        """Create simplified tables for export"""
+        
+        # Companies table
+        self.cursor.execute('''
+            CREATE TABLE IF NOT EXISTS companies (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL,
+                vat_number TEXT UNIQUE,
+                is_supplier BOOLEAN,
+                is_customer BOOLEAN
+            )
+        ''')
+        
+        # Invoices table
+        self.cursor.execute('''
+            CREATE TABLE IF NOT EXISTS invoices (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                invoice_number TEXT NOT NULL,
+                invoice_date DATE,
+                supplier_id INTEGER,
+                customer_id INTEGER,
+                total_amount DECIMAL(10,2),
+                currency TEXT,
+                original_file TEXT,
+                FOREIGN KEY (supplier_id) REFERENCES companies(id),
+                FOREIGN KEY (customer_id) REFERENCES companies(id)
+            )
+        ''')
+        
+        # Invoice items table
+        self.cursor.execute('''
+            CREATE TABLE IF NOT EXISTS invoice_items (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                invoice_id INTEGER,
+                description TEXT,
+                quantity DECIMAL(10,4),
+                unit_price DECIMAL(10,4),
+                total DECIMAL(10,2),
+                FOREIGN KEY (invoice_id) REFERENCES invoices(id)
+            )
+        ''')
+        
+        self._create_indexes()
+        self.conn.commit()
+
+    # Secondary indexes on the export DB, named so bulk imports can drop and
+    # rebuild them in one sorted pass instead of updating B-trees per row.
+    # The inline UNIQUE on companies.vat_number can't be dropped, but the
+    # in-memory company cache keeps most inserts away from it anyway.
+    _INDEXES = (
+        ('idx_invoices_supplier', 'CREATE INDEX IF NOT EXISTS idx_invoices_supplier ON invoices(supplier_id)'),
+        ('idx_invoices_customer', 'CREATE INDEX IF NOT EXISTS idx_invoices_customer ON invoices(customer_id)'),
+        ('idx_invoices_number', 'CREATE INDEX IF NOT EXISTS idx_invoices_number ON invoices(invoice_number)'),
+        ('idx_items_invoice', 'CREATE INDEX IF NOT EXISTS idx_items_invoice ON invoice_items(invoice_id)'),
+    )
+
+    def _create_indexes(self):
+        for _, ddl in self._INDEXES:
+            self.cursor.execute(ddl)
+
+    def _drop_indexes(self):
+        for name, _ in self._INDEXES:
+            self.cursor.execute(f'DROP INDEX IF EXISTS {name}')
+
+    def _extract_invoice_row(self, json_path, streaming=False):
+        """Parse one OCR JSON and return (invoice_number, insertable row tuple).
+
+        Only company get-or-create touches the database here; the invoice
+        row itself is returned so callers can stage it for executemany.
+        """
+        # orjson parses the multi-MB OCR exports several times faster than
+        # stdlib json, and the mmap avoids a whole-file bytes copy; files too
+        # big to materialize can opt into the page-at-a-time streaming parse
+        if streaming and os.path.getsize(json_path) >= _STREAMING_THRESHOLD:
+            ocr_data = _load_json_streaming(json_path)
+        else:
+            ocr_data = _load_json(json_path)
+
+        # Extract invoice data using your existing extractor - one combined
+        # scan covers number, date, amounts and both companies
+        from file_handler.services.invoice_extractor import InvoiceExtractor
+        extractor = InvoiceExtractor(ocr_data)
+        fields = extractor.extract_fields()
+
+        supplier_id = self._get_or_create_company(
+            fields['supplier_info'].get('name', 'Unknown'),
+            fields['supplier_info'].get('vat_number'),
+            is_supplier=True
+        )
+        customer_id = self._get_or_create_company(
+            fields['customer_info'].get('name', 'Unknown'),
+            fields['customer_info'].get('vat_number'),
+            is_customer=True
+        )
+
+        data = {
+            'path': json_path,
+            'invoice_number': fields['invoice_number'],
+            'invoice_date': fields['invoice_date'],
+            'total': float(fields['amounts'].get('total', 0)),
+        }
+        return data['invoice_number'], self._invoice_row_builder(data, supplier_id, customer_id)
+
+    def process_json_file(self, json_path, _autocommit=True, streaming=False):
+        """Process a single JSON file and insert into SQLite.
+
+        export_batch passes _autocommit=False so it can commit once per
+        chunk of files instead of once per file. streaming=True trades
+        parse speed for O(page) memory on files over 10 MB.
+        """
+        if _autocommit:
+            self._begin()
+        invoice_number, row = self._extract_invoice_row(json_path, streaming=streaming)
+        self.cursor.execute(_SQL_INSERT_INVOICE, row)
+
+        if _autocommit:
+            self.conn.commit()
+        return invoice_number
+    
+    def _get_or_create_company(self, name, vat_number, is_supplier=False, is_customer=False):
+        """Get existing company or create new one"""
+
+        if vat_number:
+            cached = self._company_cache.get(vat_number)
+            if cached is not None:
+                return cached
+            self.cursor.execute(_SQL_SELECT_COMPANY, (vat_number,))
+            result = self.cursor.fetchone()
+            if result:
+                self._company_cache[vat_number] = result[0]
+                return result[0]
+
+        self.cursor.execute(_SQL_INSERT_COMPANY, (name, vat_number, is_supplier, is_customer))
+
+        if vat_number:
+            self._company_cache[vat_number] = self.cursor.lastrowid
+        return self.cursor.lastrowid
+    
+    # Commit every this many files during export_batch - one fsync per chunk
+    # instead of one per invoice, while keeping crash recovery reasonable
+    COMMIT_EVERY = 500
+
+    # Flush staged invoice rows to executemany in chunks of this size to cap
+    # the staging list's memory footprint
+    FLUSH_EVERY = 1000
+
+    # Print one progress line per this many exported files - a print per
+    # invoice means a stdio syscall per file, which dominates once parsing
+    # and inserts are fast
+    PROGRESS_EVERY = 100
+
+    def _flush_invoices(self, rows):
+        """Insert staged invoice rows with one executemany call"""
+        if rows:
+            self.cursor.executemany(_SQL_INSERT_INVOICE, rows)
+            rows.clear()
+
+    def export_batch(self, json_dir, bulk=False):
+        """Export all JSON files in a directory.
+
+        With bulk=True the secondary indexes are dropped for the duration of
+        the import and rebuilt (plus ANALYZE) afterwards - worthwhile for
+        large first-time imports where per-row index updates dominate.
+        """
+        # os.scandir avoids pathlib's per-entry Path allocation and extra
+        # stat, which shows up on directories with tens of thousands of JSONs
+        with os.scandir(json_dir) as it:
+            paths = [e.path for e in it if e.name.endswith('.json') and e.is_file()]
+        count = 0
+        staged = []
+
+        # Warm the company cache in one pass before the per-file loop
+        self._company_cache.update(
+            self.cursor.execute(_SQL_ALL_COMPANIES)
+        )
+
+        # Phase 1: JSON parse + extraction is pure CPU, so fan it out across
+        # cores. Phase 2 below keeps all inserts on this process - SQLite in
+        # WAL mode still only supports one writer.
+        executor = None
+        if len(paths) > 1:
+            executor = ProcessPoolExecutor(max_workers=os.cpu_count())
+            outcomes = executor.map(_extract_from_json, paths, chunksize=16)
+        else:
+            outcomes = map(_extract_from_json, paths)
+
+        try:
+            if bulk:
+                self._drop_indexes()
+            self._begin()
+            for data in outcomes:
+                if 'error' in data:
+                    print(f"✗ Failed {Path(data['path']).name}: {data['error']}")
+                    continue
+
+                try:
+                    supplier_id = self._get_or_create_company(
+                        data['supplier_info'].get('name', 'Unknown'),
+                        data['supplier_info'].get('vat_number'),
+                        is_supplier=True
+                    )
+                    customer_id = self._get_or_create_company(
+                        data['customer_info'].get('name', 'Unknown'),
+                        data['customer_info'].get('vat_number'),
+                        is_customer=True
+                    )
+                    staged.append(self._invoice_row_builder(data, supplier_id, customer_id))
+                except sqlite3.Error as e:
+                    # One bad row (a constraint hit, a malformed value)
+                    # skips that invoice, not the rest of the batch
+                    print(f"✗ Failed {Path(data['path']).name}: {e}")
+                    continue
+                count += 1
+                if count % self.PROGRESS_EVERY == 0:
+                    print(f"✓ Exported {count} invoices...")
+                if len(staged) >= self.FLUSH_EVERY:
+                    self._flush_invoices(staged)
+                if count % self.COMMIT_EVERY == 0:
+                    self._flush_invoices(staged)
+                    self.conn.commit()
+                    self._begin()
+            self._flush_invoices(staged)
+            self.conn.commit()
+            if bulk:
+                self._create_indexes()
+                self.cursor.execute('ANALYZE')
+                self.conn.commit()
+        except Exception:
+            # Close the open BEGIN IMMEDIATE so the connection stays
+            # usable - the next _begin() would otherwise die with
+            # 'cannot start a transaction within a transaction' - and in
+            # bulk mode put the dropped secondary indexes back before
+            # surfacing the failure
+            self.conn.rollback()
+            if bulk:
+                self._create_indexes()
+            raise
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+        print(f"\nExported {count} invoices to {self.output_db}")
+        return count
+    
+    def close(self):
         self.conn.close()
\ No newline at end of file
@@ -1,32 +1,38 @@
-# file_handler/management/commands/load_initial_data.py
-from django.core.management.base import BaseCommand
-from file_handler.models import Country, Currency
-
-class Command(BaseCommand):
-    help = 'Load initial reference data'
-    
-    def handle(self, *args, **options):
-        # Countries
-        countries = [
-            ('RO', 'Romania'),
-            ('IT', 'Italy'),
-            ('US', 'United States'),
-            ('DE', 'Germany'),
-            ('LU', 'Luxembourg'),
-        ]
-        for code, name in countries:
-            Country.objects.get_or_create(code=code, defaults={'name': name})
-        
-        # Currencies
-        currencies = [
-            ('EUR', 'Euro', '€'),
-            ('USD', 'US Dollar', '$'),
-            ('RON', 'Romanian Leu', 'lei'),
-        ]
-        for code, name, symbol in currencies:
-            Currency.objects.get_or_create(
-                code=code, 
-                defaults={'name': name, 'symbol': symbol}
-            )
-        
-        self.stdout.write(self.style.SUCCESS('Initial data loaded'))
\ No newline at end of file
+# file_handler/management/commands/load_initial_data.py
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from file_handler.models import Country, Currency
+
+class Command(BaseCommand):
+    help = 'Load initial reference data'
+
+    def handle(self, *args, **options):
+        countries = [
+            ('RO', 'Romania'),
+            ('IT', 'Italy'),
+            ('US', 'United States'),
+            ('DE', 'Germany'),
+            ('LU', 'Luxembourg'),
+        ]
+
+        currencies = [
+            ('EUR', 'Euro', '€'),
+            ('USD', 'US Dollar', '$'),
+            ('RON', 'Romanian Leu', 'lei'),
+        ]
+
+        # One bulk insert per table inside a single transaction instead of a
+        # get_or_create round-trip per row; ignore_conflicts makes reruns no-ops
+        with transaction.atomic():
+            Country.objects.bulk_create(
+                [Country(code=code, name=name) for code, name in countries],
+                ignore_conflicts=True
+            )
+            Currency.objects.bulk_create(
+                [Currency(code=code, name=name, symbol=symbol)
+                 for code, name, symbol in currencies],
+                ignore_conflicts=True
+            )
+
+        self.stdout.write(self.style.SUCCESS('Initial data loaded'))
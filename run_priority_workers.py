@@ -14,8 +14,8 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from temporalio.client import Client
 from temporalio.worker import Worker
-from temporal_app.activities import process_file_activity
-from temporal_app.workflows import FileProcessingWorkflow
+from temporal_app.activities import process_file_activity, process_files_activity, warm_up_model
+from temporal_app.workflows import ALL_WORKFLOWS
 
 # Configure logging
 logging.basicConfig(
@@ -25,23 +25,28 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-async def run_worker(task_queue: str, max_concurrent: int, worker_name: str):
-    """Run a single worker for a specific task queue"""
-    
+async def run_worker(client: Client, activity_executor: ThreadPoolExecutor,
+                     task_queue: str, max_concurrent: int, worker_name: str):
+    """Run a single worker for a specific task queue.
+
+    All workers share one Client (a single multiplexed gRPC connection) and
+    one activity executor, so the thread budget is global rather than
+    per-queue; max_concurrent_activities still enforces the per-queue
+    priority weighting.
+    """
+
     logger.info(f"Starting {worker_name} worker...")
     logger.info(f"  Task Queue: {task_queue}")
     logger.info(f"  Max Concurrent Activities: {max_concurrent}")
-    
+
     try:
-        # Connect to Temporal
-        client = await Client.connect("localhost:7233")
-        
-        # Create and run worker
+        # Create and run worker on the shared client
         worker = Worker(
             client,
             task_queue=task_queue,
-            workflows=[FileProcessingWorkflow],
-            activities=[process_file_activity],
+            workflows=ALL_WORKFLOWS,
+            activities=[process_file_activity, process_files_activity],
+            activity_executor=activity_executor,
             max_concurrent_activities=max_concurrent,
             max_concurrent_workflow_tasks=10,
         )
@@ -82,11 +87,28 @@ async def main():
         }
     ]
     
+    # One connection and one thread pool for all queues - three separate
+    # clients meant three gRPC channels and three private thread budgets
+    client = await Client.connect("localhost:7233")
+    activity_executor = ThreadPoolExecutor(
+        max_workers=sum(w["max_concurrent"] for w in workers)
+    )
+
+    # Warm up the OCR model so the first real activity doesn't pay the load cost
+    logger.info("Warming up OCR model...")
+    try:
+        await asyncio.to_thread(warm_up_model)
+        logger.info("[SUCCESS] OCR model warmed up")
+    except Exception as warmup_error:
+        logger.warning(f"OCR model warmup failed (will load lazily): {warmup_error}")
+
     # Create tasks for all workers
     tasks = []
     for worker_config in workers:
         task = asyncio.create_task(
             run_worker(
+                client,
+                activity_executor,
                 task_queue=worker_config["queue"],
                 max_concurrent=worker_config["max_concurrent"],
                 worker_name=worker_config["name"]
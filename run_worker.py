@@ -7,8 +7,13 @@ import signal
 from typing import Optional
 from datetime import datetime
 
-# Fix encoding for Windows console
-if sys.platform == 'win32':
+# Fix encoding for Windows console - but only when UTF-8 isn't already
+# configured (PYTHONIOENCODING or PYTHONUTF8=1), since rewrapping adds a
+# second buffering layer on every log line for nothing
+if sys.platform == 'win32' and not (
+    os.environ.get('PYTHONIOENCODING', '').lower().startswith('utf-8')
+    or os.environ.get('PYTHONUTF8') == '1'
+):
     import io
     sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
     sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
@@ -20,8 +25,8 @@ from temporalio.client import Client
 from temporalio.worker import Worker
 
 # Import your workflows and activities
-from temporal_app.activities import process_file_activity
-from temporal_app.workflows import FileProcessingWorkflow
+from temporal_app.activities import process_file_activity, process_files_activity, warm_up_model
+from temporal_app.workflows import ALL_WORKFLOWS
 
 # Enhanced logging configuration
 def setup_logging(debug_mode: bool = False):
@@ -63,10 +68,31 @@ class GracefulShutdown:
     """Handle graceful shutdown of the worker"""
     def __init__(self):
         self.shutdown_requested = False
-        
+        self.event = asyncio.Event()
+
+    def install(self):
+        """Register signal handlers on the running event loop.
+
+        add_signal_handler delivers signals natively on the loop (POSIX);
+        Windows doesn't support it, so fall back to signal.signal and hop
+        onto the loop with call_soon_threadsafe - signal handlers must not
+        touch asyncio state directly.
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            for sig in (signal.SIGINT, signal.SIGTERM):
+                loop.add_signal_handler(sig, self.request_shutdown, sig, None)
+        except NotImplementedError:
+            for sig in (signal.SIGINT, signal.SIGTERM):
+                signal.signal(
+                    sig,
+                    lambda s, f: loop.call_soon_threadsafe(self.request_shutdown, s, f)
+                )
+
     def request_shutdown(self, signum, frame):
         logger.info(f"Received signal {signum}. Requesting graceful shutdown...")
         self.shutdown_requested = True
+        self.event.set()
 
 
 async def create_temporal_client(temporal_host: str = "localhost:7233", max_retries: int = 3) -> Optional[Client]:
@@ -117,46 +143,31 @@ async def create_temporal_client(temporal_host: str = "localhost:7233", max_retr
 
 
 async def verify_imports():
-    """Verify that all required modules are properly imported"""
+    """Verify that the workflow and activity are imported and decorated.
+
+    Two hasattr checks cover every temporalio version we've run against
+    (_defn pre-1.15, __temporal_activity_definition from 1.15 on) - no
+    need to walk dir() scanning attribute names on every startup.
+    """
     logger.info("Verifying imports...")
-    
-    try:
-        # Check workflow import
-        logger.info(f"[OK] FileProcessingWorkflow imported: {FileProcessingWorkflow.__name__}")
-        
-        # Check activity import - handle different temporalio versions
-        if hasattr(process_file_activity, '_defn'):
-            # Older temporalio versions
-            logger.info(f"[OK] process_file_activity imported and decorated: {process_file_activity._defn.name}")
-            return True
-        elif hasattr(process_file_activity, '__temporal_activity_definition'):
-            # Newer temporalio versions (1.15.0+)
-            logger.info(f"[OK] process_file_activity imported and decorated (v1.15.0+ style)")
-            logger.info(f"         Function name: {process_file_activity.__name__}")
-            return True
-        elif callable(process_file_activity):
-            # Activity is imported but might not be decorated
-            logger.warning(f"[WARNING] process_file_activity may not be decorated properly")
-            logger.warning(f"         Function name: {process_file_activity.__name__}")
-            logger.warning(f"         Attributes: {[a for a in dir(process_file_activity) if 'temporal' in a.lower()]}")
-            
-            # Check for any temporal-related attributes
-            temporal_attrs = [a for a in dir(process_file_activity) if 'temporal' in a.lower() or '_defn' in a]
-            if temporal_attrs:
-                logger.info(f"[OK] Found temporal attributes: {temporal_attrs}")
-                logger.info("[INFO] Activity appears to be decorated (new format)")
-                return True
-            else:
-                logger.error("[ERROR] No temporal decoration found on activity")
-                return False
+    # ALL_WORKFLOWS is the registry of every type views.py starts - if a
+    # workflow is missing its @workflow.defn, refuse to start rather than
+    # fail each workflow task at runtime
+    ok = True
+    for wf in ALL_WORKFLOWS:
+        if hasattr(wf, '_defn') or hasattr(wf, '__temporal_workflow_definition'):
+            logger.info(f"[OK] {wf.__name__} imported and decorated")
         else:
-            logger.error("[ERROR] process_file_activity is not a callable function")
-            return False
-            
-    except Exception as e:
-        logger.error(f"[ERROR] Import verification failed: {e}")
-        logger.error(f"        Error type: {type(e).__name__}")
-        return False
+            logger.error(f"[ERROR] No temporal decoration found on {wf.__name__}")
+            ok = False
+
+    ok = ok and (hasattr(process_file_activity, '_defn')
+                 or hasattr(process_file_activity, '__temporal_activity_definition'))
+    if ok:
+        logger.info(f"[OK] process_file_activity imported and decorated: {process_file_activity.__name__}")
+    else:
+        logger.error("[ERROR] No temporal decoration found on process_file_activity")
+    return ok
 
 
 async def main():
@@ -189,18 +200,25 @@ async def main():
         logger.error("Could not establish connection to Temporal server. Exiting.")
         sys.exit(1)
     
+    # Warm up the OCR model so the first real activity doesn't pay the load cost
+    logger.info("Warming up OCR model...")
+    try:
+        await asyncio.to_thread(warm_up_model)
+        logger.info("[SUCCESS] OCR model warmed up")
+    except Exception as warmup_error:
+        logger.warning(f"OCR model warmup failed (will load lazily): {warmup_error}")
+
     # Setup graceful shutdown
     shutdown_handler = GracefulShutdown()
-    signal.signal(signal.SIGINT, shutdown_handler.request_shutdown)
-    signal.signal(signal.SIGTERM, shutdown_handler.request_shutdown)
+    shutdown_handler.install()
     
     try:
         # Create the worker
         worker = Worker(
             client,
             task_queue=TASK_QUEUE,
-            workflows=[FileProcessingWorkflow],
-            activities=[process_file_activity],
+            workflows=ALL_WORKFLOWS,
+            activities=[process_file_activity, process_files_activity],
             # Optional configurations
             max_concurrent_activities=10,  # Limit concurrent activities
             max_concurrent_workflow_tasks=10,  # Limit concurrent workflow tasks
@@ -210,11 +228,11 @@ async def main():
         logger.info("=" * 60)
         logger.info(f"[SUCCESS] Worker successfully created")
         logger.info(f"         Task Queue: {TASK_QUEUE}")
-        logger.info(f"         Registered Workflows: {[w.__name__ for w in [FileProcessingWorkflow]]}")
+        logger.info(f"         Registered Workflows: {[w.__name__ for w in ALL_WORKFLOWS]}")
         
         # Handle activity name display for different temporalio versions
         activity_names = []
-        for activity in [process_file_activity]:
+        for activity in [process_file_activity, process_files_activity]:
             if hasattr(activity, '_defn'):
                 # Older versions
                 activity_names.append(activity._defn.name)
@@ -230,23 +248,24 @@ async def main():
         
         # Create a task for the worker
         worker_task = asyncio.create_task(worker.run())
-        
-        # Monitor for shutdown
-        while not shutdown_handler.shutdown_requested:
-            # Check if worker task is still running
-            if worker_task.done():
-                # Worker stopped unexpectedly
-                exception = worker_task.exception()
-                if exception:
-                    logger.error(f"Worker task failed: {exception}")
-                    raise exception
-                else:
-                    logger.info("Worker task completed")
-                    break
-            
-            # Brief sleep to prevent busy waiting
-            await asyncio.sleep(1)
-        
+        shutdown_task = asyncio.create_task(shutdown_handler.event.wait())
+
+        # Sleep until either the worker stops or a shutdown signal arrives -
+        # no polling loop waking up once a second to check a bool
+        done, _ = await asyncio.wait(
+            {worker_task, shutdown_task},
+            return_when=asyncio.FIRST_COMPLETED,
+        )
+
+        if worker_task in done:
+            shutdown_task.cancel()
+            # Worker stopped on its own
+            exception = worker_task.exception()
+            if exception:
+                logger.error(f"Worker task failed: {exception}")
+                raise exception
+            logger.info("Worker task completed")
+
         if shutdown_handler.shutdown_requested:
             logger.info("Shutdown requested, stopping worker...")
             worker_task.cancel()
@@ -1,20 +1,28 @@
-import requests
-import json
-
-# Test batch upload
-url = "http://localhost:8000/file_handler/batch/upload/"
-
-# CHANGE THESE TO YOUR ACTUAL FILES IN SUPABASE
-payload = {
-    "files": [
-        {"path": "test.pdf", "bucket": "linkledger"},
-        {"path": "test_document.pdf", "bucket": "linkledger"},
-        {"path": "amazon.de.castisebi.pdf", "bucket": "linkledger"},
-    ],
-    "priority": "normal",
-    "batch_name": "Test Batch"
-}
-
-response = requests.post(url, json=payload)
-print(f"Status: {response.status_code}")
-print(json.dumps(response.json(), indent=2))
\ No newline at end of file
+import requests
+import orjson
+from requests.adapters import HTTPAdapter
+
+# One pooled session with keep-alive - repeated runs reuse the TCP
+# connection instead of paying setup/teardown on every call
+session = requests.Session()
+session.mount('http://', HTTPAdapter(pool_connections=10, pool_maxsize=10, max_retries=3))
+session.mount('https://', HTTPAdapter(pool_connections=10, pool_maxsize=10, max_retries=3))
+
+# Test batch upload
+url = "http://localhost:8000/file_handler/batch/upload/"
+
+# CHANGE THESE TO YOUR ACTUAL FILES IN SUPABASE
+payload = {
+    "files": [
+        {"path": "test.pdf", "bucket": "linkledger"},
+        {"path": "test_document.pdf", "bucket": "linkledger"},
+        {"path": "amazon.de.castisebi.pdf", "bucket": "linkledger"},
+    ],
+    "priority": "normal",
+    "batch_name": "Test Batch"
+}
+
+response = session.post(url, json=payload)
+print(f"Status: {response.status_code}")
+# orjson parses the raw bytes directly - no utf-8 decode into a str first
+print(orjson.dumps(orjson.loads(response.content), option=orjson.OPT_INDENT_2).decode())
@@ -1,5 +1,9 @@
+import asyncio
+import logging
 import os
+import threading
 import time
+import httpx
 from supabase import create_client, Client
 from pathlib import Path
 from dotenv import load_dotenv  # ADĂUGAȚI ASTA!
@@ -7,82 +11,134 @@ from dotenv import load_dotenv  # ADĂUGAȚI ASTA!
 # ÎNCĂRCAȚI .env ÎNAINTE DE A CITI VARIABILELE!
 load_dotenv()
 
+# Log structurat, emis doar la evenimente reale - fără spinner care
+# forțează write+flush pe TTY la fiecare tick
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+logger = logging.getLogger("upload")
+
 # Configurare
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_SERVICE_KEY")
 
-def upload_test_file(supabase: Client, file_path: str):
-    """Încarcă un fișier de test în Supabase"""
-    
-    with open(file_path, 'rb') as f:
-        file_content = f.read()
-    
-    file_name = Path(file_path).name
-    
-    print(f"📤 Încărcare {file_name} în Supabase...")
-    
-    try:
-        # Upload în bucket-ul documents
-        result = supabase.storage.from_('documents').upload(
-            path=file_name,
-            file=file_content,
-            file_options={"content-type": "application/pdf"}
-        )
-        print(f"✅ Fișier încărcat cu succes!")
-        return file_name
-    except Exception as e:
-        if "already exists" in str(e):
-            print(f"⚠️  Fișierul există deja. Șterg și reîncerc...")
-            # Șterge fișierul existent
-            supabase.storage.from_('documents').remove([file_name])
-            # Reîncearcă upload
-            result = supabase.storage.from_('documents').upload(
-                path=file_name,
-                file=file_content,
-                file_options={"content-type": "application/pdf"}
+async def upload_many(supabase: Client, file_paths):
+    """Încarcă fișiere prin URL-uri presemnate, cu PUT-urile în paralel.
+
+    Un singur PUT cu x-upsert per fișier - fără vechiul drum lent de
+    „șterge și reîncarcă" la conflict (două round-trip-uri în plus), iar
+    fișierele urcă simultan, nu pe rând.
+    """
+    signed = [
+        supabase.storage.from_('documents').create_signed_upload_url(Path(p).name)
+        for p in file_paths
+    ]
+
+    async def _file_chunks(path, chunk_size=65536):
+        # Corpul cererii curge din fișier în bucăți de 64 KiB - PDF-ul nu
+        # mai este citit integral în memorie înainte de upload
+        with open(path, 'rb') as f:
+            while True:
+                chunk = await asyncio.to_thread(f.read, chunk_size)
+                if not chunk:
+                    return
+                yield chunk
+
+    async with httpx.AsyncClient(http2=True, timeout=60.0) as client:
+        async def _put(info, path):
+            file_name = Path(path).name
+            print(f"📤 Încărcare {file_name} în Supabase...")
+            resp = await client.put(
+                info['signed_url'],
+                content=_file_chunks(path),
+                headers={'Content-Type': 'application/pdf', 'x-upsert': 'true'},
             )
-            print(f"✅ Fișier încărcat după ștergere!")
+            resp.raise_for_status()
+            print(f"✅ {file_name} încărcat cu succes!")
             return file_name
-        else:
-            print(f"❌ Eroare la upload: {e}")
-            raise
+
+        return await asyncio.gather(*[
+            _put(info, path) for info, path in zip(signed, file_paths)
+        ])
 
 def check_processing_result(supabase: Client, original_filename: str, max_wait: int = 60):
     """Verifică dacă fișierul a fost procesat"""
     
     base_name = Path(original_filename).stem
     json_path = f"json-output/{base_name}.json"
-    
+
     print(f"\n⏳ Aștept procesarea... (max {max_wait} secunde)")
     print(f"   Caut rezultatul la: {json_path}")
-    
+
     start_time = time.time()
-    
-    while time.time() - start_time < max_wait:
-        try:
-            # Încearcă să descarce fișierul JSON rezultat
-            result = supabase.storage.from_('documents').download(json_path)
-            
-            if result:
-                print(f"\n✅ Procesare completă! Fișierul JSON are {len(result)} bytes")
-                
-                # Salvează rezultatul local pentru inspecție
-                output_file = f"test_output_{base_name}.json"
-                with open(output_file, 'wb') as f:
-                    f.write(result)
-                print(f"💾 Rezultat salvat local în: {output_file}")
-                
-                return True
-                
-        except Exception as e:
-            # Fișierul nu există încă
-            pass
-        
-        # Afișează progres
-        elapsed = int(time.time() - start_time)
-        print(f"\r   Timp scurs: {elapsed}s...", end="", flush=True)
-        time.sleep(2)
-    
+
+    def _download():
+        # Descarcă și salvează rezultatul; ridică excepție dacă nu există încă
+        result = supabase.storage.from_('documents').download(json_path)
+        if not result:
+            return False
+        # Un singur mesaj, emis doar la evenimentul real de finalizare
+        logger.info("✅ Procesare completă în %.1fs - fișierul JSON are %d bytes",
+                    time.time() - start_time, len(result))
+        # Salvează rezultatul local pentru inspecție
+        output_file = f"test_output_{base_name}.json"
+        with open(output_file, 'wb') as f:
+            f.write(result)
+        logger.info("💾 Rezultat salvat local în: %s", output_file)
+        return True
+
+    # Push în loc de polling: un canal Realtime pe storage.objects ne anunță
+    # când worker-ul scrie JSON-ul, deci nu mai facem câte un request la 2s
+    ready = threading.Event()
+    channel = None
+    try:
+        channel = supabase.channel('storage-objects')
+        channel.on_postgres_changes(
+            event='INSERT',
+            schema='storage',
+            table='objects',
+            filter=f'name=eq.{json_path}',
+            callback=lambda _payload: ready.set(),
+        ).subscribe()
+    except Exception:
+        channel = None
+
+    try:
+        if channel is not None:
+            # Fișierul poate exista deja (worker-ul a terminat înainte de
+            # subscriere), deci verificăm o dată înainte de a aștepta
+            try:
+                if _download():
+                    return True
+            except Exception:
+                pass
+            if ready.wait(timeout=max_wait):
+                try:
+                    if _download():
+                        return True
+                except Exception:
+                    pass
+        else:
+            # Fără Realtime: reîncercări cu backoff exponențial - mult mai
+            # puține round-trip-uri decât polling-ul fix la 2 secunde
+            delay = 1
+            while time.time() - start_time < max_wait:
+                try:
+                    if _download():
+                        return True
+                except Exception:
+                    # Fișierul nu există încă - fără spinner, doar așteptăm
+                    pass
+                remaining = max_wait - (time.time() - start_time)
+                if remaining <= 0:
+                    break
+                time.sleep(min(delay, remaining))
+                delay = min(delay * 2, 8)
+    finally:
+        if channel is not None:
+            try:
+                channel.unsubscribe()
+            except Exception:
+                pass
+
     print(f"\n⏱️  Timeout! Procesarea nu s-a finalizat în {max_wait} secunde")
     return False
 
@@ -112,7 +168,7 @@ def main():
         return
     
     # Upload fișier
-    uploaded_file = upload_test_file(supabase, test_pdf)
+    uploaded_file = asyncio.run(upload_many(supabase, [test_pdf]))[0]
     
     # Monitorizează procesarea
     success = check_processing_result(supabase, uploaded_file)
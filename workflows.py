@@ -1,10 +1,69 @@
+import asyncio
 from datetime import timedelta
 from temporalio import workflow
 from temporalio.common import RetryPolicy
+from temporalio.workflow import ParentClosePolicy
 
 # Import with pass_through to avoid sandbox restrictions
 with workflow.unsafe.imports_passed_through():
-    from temporal_app.activities import process_file_activity
+    from temporal_app.activities import (
+        _MIN_BATCH_SIZE,
+        ProcessFileArgs,
+        process_file_activity,
+        process_files_activity,
+    )
+
+
+# Single-pass workflow-ID sanitizing; the chained .replace() equivalent
+# copies the path three times per file
+_SAFE_NAME_TABLE = str.maketrans({'/': '-', '.': '-', ' ': '-'})
+
+# Built once - the lookup runs per file on the batch path
+_PRIORITY_QUEUES = {
+    'high': 'file-processing-high-priority',
+    'normal': 'file-processing-task-queue',
+    'low': 'file-processing-low-priority'
+}
+
+
+def get_task_queue_by_priority(priority):
+    """
+    Map priority to different task queues for priority-based processing.
+    """
+    return _PRIORITY_QUEUES.get(priority, 'file-processing-task-queue')
+
+
+# Relative share each queue gets when a batch spills over
+_QUEUE_WEIGHTS = {'high': 4, 'normal': 2, 'low': 1}
+_QUEUE_ORDER = ['high', 'normal', 'low']
+
+
+class _FairShareRouter:
+    """
+    Weighted round-robin over the task queues at or below a batch's
+    priority.
+
+    With static one-queue-per-priority routing, a flood of high-priority
+    files fills the high queue while normal/low workers sit idle - and a
+    big enough flood monopolizes the high workers for the whole batch.
+    Spreading a batch across its own queue and the queues below it (4:2:1
+    for high, 2:1 for normal) keeps all eligible workers busy without
+    ever promoting work onto a higher-priority queue. Pure deterministic
+    Python, so it is safe to run inside workflow code.
+    """
+
+    def __init__(self, priority):
+        if priority not in _QUEUE_WEIGHTS:
+            priority = 'normal'
+        self._eligible = _QUEUE_ORDER[_QUEUE_ORDER.index(priority):]
+        self._issued = {p: 0 for p in self._eligible}
+
+    def next_queue(self):
+        """Pick the eligible priority with the smallest issued/weight ratio"""
+        priority = min(self._eligible,
+                       key=lambda p: self._issued[p] / _QUEUE_WEIGHTS[p])
+        self._issued[priority] += 1
+        return get_task_queue_by_priority(priority)
 
 
 @workflow.defn
@@ -35,12 +94,12 @@ class FileProcessingWorkflow:
         workflow.logger.info(f"Starting FileProcessingWorkflow for file: {filename}")
         
         # Prepare activity arguments
-        activity_args = {
-            "filename": filename,
-            "bucket_name": bucket_name,
-            "supabase_url": supabase_url,
-            "supabase_key": supabase_key,
-        }
+        activity_args = ProcessFileArgs(
+            filename=filename,
+            bucket_name=bucket_name,
+            supabase_url=supabase_url,
+            supabase_key=supabase_key,
+        )
         
         workflow.logger.info(f"Executing process_file_activity for {filename}")
         
@@ -50,6 +109,10 @@ class FileProcessingWorkflow:
                 process_file_activity,
                 activity_args,
                 start_to_close_timeout=timedelta(minutes=10),  # Increased timeout for large files
+                # A stuck OCR process is detected after one missed
+                # heartbeat and retried on another worker, instead of
+                # holding the slot until the 10-minute timeout
+                heartbeat_timeout=timedelta(seconds=30),
                 retry_policy=RetryPolicy(
                     maximum_attempts=3,
                     initial_interval=timedelta(seconds=1),
@@ -63,4 +126,223 @@ class FileProcessingWorkflow:
             
         except Exception as e:
             workflow.logger.error(f"Failed to process {filename}: {e}")
-            raise
\ No newline at end of file
+            raise
+
+
+@workflow.defn
+class BatchDispatcherWorkflow:
+    """
+    Workflow that fans a batch out to one FileProcessingWorkflow per file.
+
+    The view hands over the whole file list in a single start_workflow
+    call and this workflow starts the children from inside Temporal, so
+    a batch of N files costs the webhook one client RPC instead of N.
+    """
+
+    @workflow.run
+    async def run(
+        self,
+        files: list,
+        priority: str,
+        batch_id: str,
+        supabase_url: str,
+        supabase_key: str,
+    ) -> dict:
+        """
+        Start a child workflow per file and wait for all of them.
+
+        Args:
+            files: List of {"path": ..., "bucket": ...} dicts
+            priority: Batch priority, mapped to a task queue
+            batch_id: UUID the child workflow IDs are derived from
+            supabase_url: Supabase project URL
+            supabase_key: Supabase service key
+
+        Returns:
+            Summary dict with total/completed/failed counts
+        """
+        workflow.logger.info(
+            f"Dispatching batch {batch_id} with {len(files)} files"
+        )
+
+        router = _FairShareRouter(priority)
+
+        # Start every child first, then await them - the children run
+        # concurrently on the workers instead of one after another
+        handles = []
+        seen = set()
+        for position, file_info in enumerate(files):
+            file_path = file_info['path']
+            # A re-delivered webhook can land the same file twice in one
+            # window - skip it rather than OCR it twice
+            key = (file_info.get('bucket', 'linkledger'), file_path)
+            if key in seen:
+                workflow.logger.info(f"Skipping duplicate file in batch: {file_path}")
+                continue
+            seen.add(key)
+            safe_filename = file_path.translate(_SAFE_NAME_TABLE)
+            handle = await workflow.start_child_workflow(
+                FileProcessingWorkflow.run,
+                args=[
+                    file_path,
+                    file_info.get('bucket', 'linkledger'),
+                    supabase_url,
+                    supabase_key,
+                ],
+                id=f"batch-{batch_id[:8]}-{position:03d}-{safe_filename}",
+                task_queue=router.next_queue(),
+            )
+            handles.append(handle)
+
+        results = await asyncio.gather(*handles, return_exceptions=True)
+
+        completed = sum(1 for r in results if not isinstance(r, Exception))
+        failed = len(results) - completed
+        workflow.logger.info(
+            f"Batch {batch_id} finished: {completed} completed, {failed} failed"
+        )
+        return {
+            'batch_id': batch_id,
+            'total': len(files),
+            'completed': completed,
+            'failed': failed,
+        }
+
+
+@workflow.defn
+class BatchAccumulatorWorkflow:
+    """
+    Long-running workflow that batches webhook uploads before dispatch.
+
+    Each webhook event arrives as an add_file signal - far cheaper than
+    a start_workflow RPC - and the main loop flushes the buffer as one
+    BatchDispatcherWorkflow once FLUSH_MAX_FILES have accumulated or
+    FLUSH_MAX_WAIT has passed since the first buffered file. A folder
+    upload that fires 50 webhooks in a burst becomes a couple of child
+    batches instead of 50 independent workflows.
+    """
+
+    # Flush when this many files are buffered...
+    FLUSH_MAX_FILES = 25
+    # ...or this long after the first file of a window arrives
+    FLUSH_MAX_WAIT = timedelta(seconds=2)
+    # continue-as-new after this many dispatched files keeps history bounded
+    MAX_FILES_PER_RUN = 500
+    # Cross-window dedup horizon: bucket/path keys remembered so a
+    # re-delivered or re-uploaded file doesn't run OCR again
+    RECENT_KEYS_MAX = 1000
+
+    def __init__(self):
+        self._pending = []
+        self._recent = {}
+
+    @workflow.signal
+    def add_file(self, file_path: str, bucket_name: str):
+        self._pending.append({'path': file_path, 'bucket': bucket_name})
+
+    @workflow.run
+    async def run(self, supabase_url: str, supabase_key: str,
+                  recent: list = None) -> None:
+        # Dict for insertion order, so trimming drops the oldest keys;
+        # carried across continue-as-new as a list of [bucket, path]
+        self._recent = dict.fromkeys(tuple(key) for key in (recent or []))
+        dispatched = 0
+        in_flight = []
+        while True:
+            # Sleep (no timers, no history churn) until something arrives
+            await workflow.wait_condition(lambda: bool(self._pending))
+
+            # Then hold the window open briefly so a burst can coalesce
+            try:
+                await workflow.wait_condition(
+                    lambda: len(self._pending) >= self.FLUSH_MAX_FILES,
+                    timeout=self.FLUSH_MAX_WAIT,
+                )
+            except asyncio.TimeoutError:
+                pass
+
+            flushed, self._pending = self._pending, []
+
+            # Drop files dispatched in a recent window - duplicate
+            # uploads arriving in later flushes would otherwise run the
+            # whole OCR pipeline again
+            batch = []
+            for file_info in flushed:
+                key = (file_info['bucket'], file_info['path'])
+                if key in self._recent:
+                    workflow.logger.info(
+                        f"Skipping recently dispatched file: {file_info['path']}"
+                    )
+                    continue
+                self._recent[key] = None
+                batch.append(file_info)
+            if len(self._recent) > self.RECENT_KEYS_MAX:
+                for key in list(self._recent)[:-self.RECENT_KEYS_MAX]:
+                    del self._recent[key]
+            if not batch:
+                continue
+
+            batch_id = str(workflow.uuid4())
+            buckets = {f['bucket'] for f in batch}
+
+            if len(batch) >= _MIN_BATCH_SIZE and len(buckets) == 1:
+                # A single-bucket flush feeds the batched OCR activity
+                # directly: every file's pages go through the predictor
+                # as one batch instead of one model call per child
+                # workflow. Tracked but not awaited, so the next flush
+                # window opens while OCR runs.
+                workflow.logger.info(
+                    f"Flushing {len(batch)} files as batched OCR (batch {batch_id})"
+                )
+                in_flight.append(asyncio.ensure_future(workflow.execute_activity(
+                    process_files_activity,
+                    {
+                        'filenames': [f['path'] for f in batch],
+                        'bucket_name': next(iter(buckets)),
+                        'supabase_url': supabase_url,
+                        'supabase_key': supabase_key,
+                    },
+                    start_to_close_timeout=timedelta(minutes=30),
+                    retry_policy=RetryPolicy(
+                        maximum_attempts=3,
+                        initial_interval=timedelta(seconds=1),
+                        maximum_interval=timedelta(seconds=10),
+                        backoff_coefficient=2,
+                    ),
+                )))
+            else:
+                workflow.logger.info(
+                    f"Flushing {len(batch)} accumulated files as batch {batch_id}"
+                )
+                await workflow.start_child_workflow(
+                    BatchDispatcherWorkflow.run,
+                    args=[batch, 'normal', batch_id, supabase_url, supabase_key],
+                    id=f"batch-dispatcher-{batch_id}",
+                    task_queue=get_task_queue_by_priority('normal'),
+                    # The accumulator continues-as-new; children must outlive it
+                    parent_close_policy=ParentClosePolicy.ABANDON,
+                )
+
+            dispatched += len(batch)
+            in_flight = [t for t in in_flight if not t.done()]
+            if dispatched >= self.MAX_FILES_PER_RUN and not self._pending:
+                # Activities cannot be abandoned like children - drain
+                # them before continuing as new
+                if in_flight:
+                    await asyncio.gather(*in_flight, return_exceptions=True)
+                workflow.continue_as_new(args=[
+                    supabase_url,
+                    supabase_key,
+                    [list(key) for key in self._recent],
+                ])
+
+
+# Every workflow type that views.py starts must be listed here - both
+# worker entry points register this list, so a workflow added without a
+# registration fails loudly at worker startup instead of producing
+# 'workflow type not registered' tasks at runtime.
+ALL_WORKFLOWS = [
+    FileProcessingWorkflow,
+    BatchDispatcherWorkflow,
+    BatchAccumulatorWorkflow,
+]
\ No newline at end of file